@@ -13,17 +13,21 @@ import json
 import copy
 import hmac
 import hashlib
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlencode
+
+import aiohttp
+import orjson
 
 from quant.error import Error
 from quant.utils import tools
 from quant.utils import logger
 from quant.const import BINANCE
+from quant.config import config
 from quant.order import Order
 from quant.asset import Asset, AssetSubscribe
 from quant.tasks import SingleTask, LoopRunTask
-from quant.utils.decorator import async_method_locker
-from quant.utils.web import Websocket, AsyncHttpRequests
+from quant.utils.decorator import async_method_locker, async_request_coalescer, async_ttl_cache
+from quant.utils.web import Websocket, AsyncHttpRequests, build_url
 from quant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
     ORDER_STATUS_CANCELED, ORDER_STATUS_FAILED
 
@@ -38,13 +42,66 @@ class BinanceRestAPI:
         host: HTTP request host.
         access_key: Account's ACCESS KEY.
         secret_key: Account's SECRET KEY.
+        pool_size: Maximum number of simultaneous connections to host, default is 32. Deployments which trade many
+            symbols concurrently should raise this value.
+        dns_cache_ttl: DNS resolution cache time(seconds), default is 300s.
+        transport: HTTP transport, `aiohttp` (HTTP/1.1, default) or `httpx` (HTTP/2 multiplexing, requires
+            `pip install thenextquant[http2]`). Any other value raises ValueError, and `httpx` raises ImportError on
+            initialize if httpx's HTTP/2 support is not installed.
     """
 
-    def __init__(self, host, access_key, secret_key):
+    def __init__(self, host, access_key, secret_key, pool_size=32, dns_cache_ttl=300, transport="aiohttp"):
         """initialize REST API client."""
         self._host = host
         self._access_key = access_key
         self._secret_key = secret_key
+        self._base_headers = {"X-MBX-APIKEY": access_key}  # Headers for every request.
+        self._hmac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)  # Keyed HMAC, copied for each signature.
+        self._pool_size = pool_size
+        self._dns_cache_ttl = dns_cache_ttl
+        if transport not in ("aiohttp", "httpx"):
+            raise ValueError("transport must be `aiohttp` or `httpx`, got: {}".format(transport))
+        self._transport = transport
+        self._httpx = None  # httpx module, only imported by `httpx` transport.
+        if transport == "httpx":
+            try:
+                import h2  # noqa: F401, required by httpx for HTTP/2.
+                import httpx
+            except ImportError as e:
+                raise ImportError("transport `httpx` requires HTTP/2 support of httpx, please install it by "
+                                  "`pip install thenextquant[http2]`. error: {}".format(e))
+            self._httpx = httpx
+        self._session = None  # HTTP session, all requests of this client share its connection pool.
+        self._client = None  # httpx client, only used by `httpx` transport.
+        AsyncHttpRequests.register_client(self)
+
+    @property
+    def session(self):
+        """HTTP session, created on first use so that it is bound to the running event loop."""
+        if not self._session or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, limit_per_host=self._pool_size,
+                                             ttl_dns_cache=self._dns_cache_ttl, keepalive_timeout=30,
+                                             enable_cleanup_closed=True, ssl=False)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def client(self):
+        """httpx client with HTTP/2 enabled, created on first use."""
+        if not self._client or self._client.is_closed:
+            limits = self._httpx.Limits(max_connections=self._pool_size, max_keepalive_connections=self._pool_size)
+            self._client = self._httpx.AsyncClient(http2=True, limits=limits, timeout=10.0, verify=False,
+                                                   proxy=config.proxy)
+        return self._client
+
+    async def close(self):
+        """Close HTTP session and release all connections."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        if self._client and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
 
     async def get_user_account(self):
         """ Get user account information.
@@ -60,6 +117,7 @@ class BinanceRestAPI:
         success, error = await self.request("GET", "/api/v3/account", params, auth=True)
         return success, error
 
+    @async_ttl_cache(1)
     async def get_server_time(self):
         """ Get server time.
 
@@ -70,11 +128,12 @@ class BinanceRestAPI:
         success, error = await self.request("GET", "/api/v1/time")
         return success, error
 
+    @async_ttl_cache(3600)
     async def get_exchange_info(self):
-        """ Get exchange information.
+        """ Get exchange information, the result is cached for 1 hour.
 
         Returns:
-            success: Success results, otherwise it's None.
+            success: Success results, otherwise it's None. It's shared by all callers, DO NOT modify it.
             error: Error information, otherwise it's None.
         """
         success, error = await self.request("GET", "/api/v1/exchangeInfo")
@@ -258,6 +317,7 @@ class BinanceRestAPI:
         success, error = await self.request("DELETE", "/api/v1/userDataStream", params=params)
         return success, error
 
+    @async_request_coalescer
     async def request(self, method, uri, params=None, body=None, headers=None, auth=False):
         """ Do HTTP request.
 
@@ -273,29 +333,53 @@ class BinanceRestAPI:
             success: Success results, otherwise it's None.
             error: Error information, otherwise it's None.
         """
-        url = urljoin(self._host, uri)
-        data = {}
-        if params:
-            data.update(params)
-        if body:
-            data.update(body)
-
-        if data:
-            query = "&".join(["=".join([str(k), str(v)]) for k, v in data.items()])
-        else:
-            query = ""
-        if auth and query:
-            signature = hmac.new(self._secret_key.encode(), query.encode(), hashlib.sha256).hexdigest()
-            query += "&signature={s}".format(s=signature)
-        if query:
-            url += ("?" + query)
-
-        if not headers:
-            headers = {}
-        headers["X-MBX-APIKEY"] = self._access_key
-        _, success, error = await AsyncHttpRequests.fetch(method, url, headers=headers, timeout=10, verify_ssl=False)
+        if auth:
+            return await self._request_signed(method, uri, params, body, headers)
+        return await self._request_public(method, uri, params, body, headers)
+
+    async def _request_public(self, method, uri, params=None, body=None, headers=None):
+        """ Do HTTP request without signature, all params and body will be put into query string."""
+        url = build_url(self._host, uri)
+        if params or body:
+            url += "?" + urlencode({**(params or {}), **(body or {})}, doseq=True)
+        return await self._fetch(method, url, headers)
+
+    async def _request_signed(self, method, uri, params=None, body=None, headers=None):
+        """ Do HTTP request with HMAC SHA256 signature, params or body must contain `timestamp`."""
+        query = urlencode({**(params or {}), **(body or {})}, doseq=True)
+        mac = self._hmac.copy()
+        mac.update(query.encode())
+        url = "{url}?{query}&signature={s}".format(url=build_url(self._host, uri), query=query, s=mac.hexdigest())
+        return await self._fetch(method, url, headers)
+
+    async def _fetch(self, method, url, headers=None):
+        """ Send HTTP request with API KEY header by client's session."""
+        headers = {**headers, **self._base_headers} if headers else self._base_headers
+        if self._transport == "httpx":
+            return await self._fetch_httpx(method, url, headers)
+        _, success, error = await AsyncHttpRequests.fetch(method, url, headers=headers, timeout=10,
+                                                          session=self.session)
         return success, error
 
+    async def _fetch_httpx(self, method, url, headers):
+        """ Send HTTP request by httpx client, the results are the same as `AsyncHttpRequests.fetch`."""
+        try:
+            response = await self.client.request(method, url, headers=headers)
+        except Exception as e:
+            logger.error("method:", method, "url:", url, "headers:", headers, "Error:", e, caller=self)
+            return None, e
+        if not response.is_success:
+            logger.error("method:", method, "url:", url, "headers:", headers, "code:", response.status_code,
+                         "result:", response.text, caller=self)
+            return None, response.text
+        try:
+            result = orjson.loads(response.content)
+        except:
+            result = response.text
+            logger.warn("response data is not json format!", "method:", method, "url:", url,
+                        "code:", response.status_code, "result:", result, caller=self)
+        return result, None
+
 
 class BinanceTrade:
     """ Binance Trade module. You can initialize trade object with some attributes in kwargs.
@@ -308,6 +392,10 @@ class BinanceTrade:
         wss: Websocket address. (default "wss://stream.binance.com:9443")
         access_key: Account's ACCESS KEY.
         secret_key Account's SECRET KEY.
+        transport: HTTP transport for REST API, `aiohttp` or `httpx`. (default "aiohttp")
+        pool_size: Maximum number of simultaneous REST API connections, raise it if you trade many symbols
+            concurrently. (default 32)
+        dns_cache_ttl: REST API DNS resolution cache time(seconds). (default 300)
         asset_update_callback: You can use this param to specific a async callback function when you initializing Trade
             object. `asset_update_callback` is like `async def on_asset_update_callback(asset: Asset): pass` and this
             callback function will be executed asynchronous when received AssetEvent.
@@ -362,7 +450,10 @@ class BinanceTrade:
         self._orders = {}  # Order data. e.g. {order_no: order, ... }
 
         # Initialize our REST API client.
-        self._rest_api = BinanceRestAPI(self._host, self._access_key, self._secret_key)
+        self._rest_api = BinanceRestAPI(self._host, self._access_key, self._secret_key,
+                                        pool_size=kwargs.get("pool_size", 32),
+                                        dns_cache_ttl=kwargs.get("dns_cache_ttl", 300),
+                                        transport=kwargs.get("transport", "aiohttp"))
 
         # Subscribe our AssetEvent.
         if self._asset_update_callback:
@@ -386,6 +477,10 @@ class BinanceTrade:
     def rest_api(self):
         return self._rest_api
 
+    async def close(self):
+        """Close REST API client's HTTP connections."""
+        await self._rest_api.close()
+
     async def _init_websocket(self):
         """ Initialize Websocket connection.
         """
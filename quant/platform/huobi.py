@@ -9,15 +9,17 @@ Date:   2018/08/30
 """
 
 import json
+import time
 import hmac
 import copy
+import asyncio
 import gzip
 import base64
 import urllib
 import hashlib
-import datetime
 from urllib import parse
-from urllib.parse import urljoin
+
+import aiohttp
 
 from quant.error import Error
 from quant.utils import tools
@@ -26,8 +28,8 @@ from quant.const import HUOBI
 from quant.order import Order
 from quant.tasks import SingleTask
 from quant.asset import Asset, AssetSubscribe
-from quant.utils.decorator import async_method_locker
-from quant.utils.web import Websocket, AsyncHttpRequests
+from quant.utils.decorator import async_method_locker, async_ttl_cache
+from quant.utils.web import Websocket, AsyncHttpRequests, build_url
 from quant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
 from quant.order import ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET
 from quant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
@@ -36,22 +38,67 @@ from quant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORD
 
 __all__ = ("HuobiRestAPI", "HuobiTrade", )
 
+# 请求headers
+GET_HEADERS = {
+    "Content-type": "application/x-www-form-urlencoded",
+    "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/39.0.2171.71 Safari/537.36"
+}
+POST_HEADERS = {
+    "Accept": "application/json",
+    "Content-type": "application/json"
+}
+
 
 class HuobiRestAPI:
     """ huobi REST API 封装
     """
 
-    def __init__(self, host, access_key, secret_key):
+    def __init__(self, host, access_key, secret_key, pool_size=32, dns_cache_ttl=300):
         """ 初始化
         @param host 请求host
         @param access_key API KEY
         @param secret_key SECRET KEY
+        @param pool_size 与host的最大并发连接数，默认32；同时交易大量交易对时应调大此值
+        @param dns_cache_ttl DNS解析缓存时间(秒)，默认300秒
         """
         self._host = host
+        self._host_name = urllib.parse.urlparse(host).hostname.lower()  # 签名使用的host
         self._access_key = access_key
         self._secret_key = secret_key
+        self._sign_template = {  # 签名固定字段
+            "AccessKeyId": access_key,
+            "SignatureMethod": "HmacSHA256",
+            "SignatureVersion": "2"
+        }
+        self._hmac = hmac.new(secret_key.encode(encoding="utf8"), digestmod=hashlib.sha256)  # 签名时复制使用
+        self._pool_size = pool_size
+        self._dns_cache_ttl = dns_cache_ttl
         self._account_id = None
+        self._last_ts = None  # 上次生成签名时间字符串的时间戳(秒)
+        self._last_ts_str = None  # 上次生成的签名时间字符串
+        self._session = None  # HTTP session，该客户端的所有请求共享其连接池
+        AsyncHttpRequests.register_client(self)
+
+    @property
+    def session(self):
+        """ HTTP session, 首次使用时创建，以绑定到正在运行的事件循环
+        """
+        if not self._session or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, limit_per_host=self._pool_size,
+                                             ttl_dns_cache=self._dns_cache_ttl, keepalive_timeout=30,
+                                             enable_cleanup_closed=True)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """ 关闭 HTTP session，释放所有连接
+        """
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
+    @async_ttl_cache(1)
     async def get_server_time(self):
         """ 获取服务器时间
         @return data int 服务器时间戳(毫秒)
@@ -59,8 +106,10 @@ class HuobiRestAPI:
         success, error = await self.request("GET", "/v1/common/timestamp")
         return success, error
 
+    @async_ttl_cache(300, error_ttl=5)
     async def get_user_accounts(self):
-        """ 获取账户信息
+        """ 获取账户信息，结果缓存5分钟
+        * NOTE: 返回结果被所有调用方共享，请勿修改
         """
         success, error = await self.request("GET", "/v1/account/accounts")
         return success, error
@@ -127,13 +176,31 @@ class HuobiRestAPI:
     async def revoke_orders(self, order_nos):
         """ 批量撤销委托单
         @param order_nos 订单列表
-        * NOTE: 单次不超过50个订单id
+        @return success 合并后的撤单结果 {"success": [order_no, ...], "failed": [{"order-id": ..., "err-msg": ...}, ...]}
+        @return error 第一个请求失败批次的错误信息，所有批次均成功则为None
+        * NOTE: 单次请求不超过50个订单id，超过50个时按每50个一批并发请求，并合并返回结果；
+            部分批次失败时，其余批次的撤单结果仍然返回，失败批次的订单id放入 failed 中
         """
-        body = {
-            "order-ids": order_nos
-        }
-        result = await self.request("POST", "/v1/order/orders/batchcancel", body=body)
-        return result
+        success = {"success": [], "failed": []}
+        if not order_nos:
+            return success, None
+        batches = [order_nos[i:i + 50] for i in range(0, len(order_nos), 50)]
+        tasks = []
+        for batch in batches:
+            body = {
+                "order-ids": batch
+            }
+            tasks.append(self.request("POST", "/v1/order/orders/batchcancel", body=body))
+        results = await asyncio.gather(*tasks)
+        error = None
+        for batch, (result, e) in zip(batches, results):
+            if e:
+                error = error or e
+                success["failed"].extend([{"order-id": order_no, "err-msg": str(e)} for order_no in batch])
+                continue
+            success["success"].extend(result.get("success", []))
+            success["failed"].extend(result.get("failed", []))
+        return success, error
 
     async def get_open_orders(self, symbol):
         """ 获取当前还未完全成交的订单信息
@@ -143,10 +210,10 @@ class HuobiRestAPI:
         account_id = await self._get_account_id()
         params = {
             "account-id": account_id,
-            "symbol": symbol,
-            "size": 500
+            "size": 500,
+            "symbol": symbol
         }
-        result = await self.request("GET", "/v1/order/openOrders", params=params)
+        result = await self.request("GET", "/v1/order/openOrders", params=params, presorted=True)
         return result
 
     async def get_order_status(self, order_no):
@@ -157,52 +224,51 @@ class HuobiRestAPI:
         success, error = await self.request("GET", uri)
         return success, error
 
-    async def request(self, method, uri, params=None, body=None):
+    async def request(self, method, uri, params=None, body=None, presorted=False):
         """ 发起请求
         @param method 请求方法 GET POST
         @param uri 请求uri
         @param params dict 请求query参数
         @param body dict 请求body数据
+        @param presorted params是否已按key排序，且key均以小写字母开头，是则签名时跳过排序
         """
-        url = urljoin(self._host, uri)
-        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
-        params = params if params else {}
-        params.update({"AccessKeyId": self._access_key,
-                       "SignatureMethod": "HmacSHA256",
-                       "SignatureVersion": "2",
-                       "Timestamp": timestamp})
-
-        host_name = urllib.parse.urlparse(self._host).hostname.lower()
-        params["Signature"] = self.generate_signature(method, params, host_name, uri)
-
-        if method == "GET":
-            headers = {
-                "Content-type": "application/x-www-form-urlencoded",
-                "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) "
-                              "Chrome/39.0.2171.71 Safari/537.36"
-            }
-        else:
-            headers = {
-                "Accept": "application/json",
-                "Content-type": "application/json"
-            }
+        url = build_url(self._host, uri)
+        timestamp = self._get_utc_timestamp()
+        # 签名字段均以大写字母开头，排在小写字母开头的请求参数之前
+        params = {**self._sign_template, "Timestamp": timestamp, **(params or {})}
+
+        params["Signature"] = self.generate_signature(method, params, self._host_name, uri, presorted)
+
+        headers = GET_HEADERS if method == "GET" else POST_HEADERS
         _, success, error = await AsyncHttpRequests.fetch(method, url, params=params, data=body, headers=headers,
-                                                          timeout=10)
+                                                          timeout=10, session=self.session)
         if error:
             return success, error
         if success.get("status") != "ok":
             return None, success
         return success.get("data"), None
 
-    def generate_signature(self, method, params, host_url, request_path):
+    def _get_utc_timestamp(self):
+        """ 获取签名使用的UTC时间字符串，格式 %Y-%m-%dT%H:%M:%S，同一秒内的请求复用同一个字符串
+        """
+        ts = int(time.time())
+        if ts != self._last_ts:
+            t = time.gmtime(ts)
+            self._last_ts = ts
+            self._last_ts_str = "{:04d}-{:02d}-{:02d}T{:02d}:{:02d}:{:02d}".format(
+                t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+        return self._last_ts_str
+
+    def generate_signature(self, method, params, host_url, request_path, presorted=False):
         """ 创建签名
+        @param presorted params是否已按key排序，是则跳过排序
         """
-        query = "&".join(["{}={}".format(k, parse.quote(str(params[k]))) for k in sorted(params.keys())])
-        payload = [method, host_url, request_path, query]
-        payload = "\n".join(payload)
-        payload = payload.encode(encoding="utf8")
-        secret_key = self._secret_key.encode(encoding="utf8")
-        digest = hmac.new(secret_key, payload, digestmod=hashlib.sha256).digest()
+        items = params.items() if presorted else sorted(params.items())
+        query = parse.urlencode(items, safe="/", quote_via=parse.quote)
+        payload = b"\n".join((method.encode(), host_url.encode(), request_path.encode(), query.encode()))
+        mac = self._hmac.copy()
+        mac.update(payload)
+        digest = mac.digest()
         signature = base64.b64encode(digest)
         signature = signature.decode()
         return signature
@@ -210,6 +276,8 @@ class HuobiRestAPI:
 
 class HuobiTrade:
     """ huobi Trade模块
+    @param pool_size REST API 最大并发连接数，默认32；同时交易大量交易对时应调大此值
+    @param dns_cache_ttl REST API DNS解析缓存时间(秒)，默认300秒
     """
 
     def __init__(self, **kwargs):
@@ -258,7 +326,9 @@ class HuobiTrade:
         self._orders = {}  # 订单
 
         # 初始化 REST API 对象
-        self._rest_api = HuobiRestAPI(self._host, self._access_key, self._secret_key)
+        self._rest_api = HuobiRestAPI(self._host, self._access_key, self._secret_key,
+                                      pool_size=kwargs.get("pool_size", 32),
+                                      dns_cache_ttl=kwargs.get("dns_cache_ttl", 300))
 
         # 初始化资产订阅
         if self._asset_update_callback:
@@ -276,18 +346,23 @@ class HuobiTrade:
     def rest_api(self):
         return self._rest_api
 
+    async def close(self):
+        """ 关闭 REST API 客户端的 HTTP 连接
+        """
+        await self._rest_api.close()
+
     async def connected_callback(self):
         """ 建立连接之后，授权登陆，然后订阅order和position
         """
         # 身份验证
-        timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+        timestamp = self._rest_api._get_utc_timestamp()
         params = {
             "AccessKeyId": self._access_key,
             "SignatureMethod": "HmacSHA256",
             "SignatureVersion": "2",
             "Timestamp": timestamp
         }
-        signature = self._rest_api.generate_signature("GET", params, "api.huobi.pro", "/ws/v1")
+        signature = self._rest_api.generate_signature("GET", params, "api.huobi.pro", "/ws/v1", presorted=True)
         params["op"] = "auth"
         params["Signature"] = signature
         await self._ws.send(params)
@@ -413,9 +488,7 @@ class HuobiTrade:
 
         # 如果传入order_nos数量大于1，那么就批量撤销传入的委托单
         if len(order_nos) > 1:
-            s, e = await self._rest_api.revoke_orders(order_nos)
-            if e:
-                return [], e
+            s, _ = await self._rest_api.revoke_orders(order_nos)
             success = s["success"]
             error = s["failed"]
             return success, error
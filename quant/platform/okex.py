@@ -9,13 +9,16 @@ Date:   2019/01/19
 Email:  huangtao@ifclover.com
 """
 
-import time
 import json
 import copy
+import asyncio
 import hmac
 import zlib
 import base64
-from urllib.parse import urljoin
+import hashlib
+
+import aiohttp
+import orjson
 
 from quant.error import Error
 from quant.utils import tools
@@ -25,7 +28,7 @@ from quant.order import Order
 from quant.tasks import SingleTask, LoopRunTask
 from quant.asset import Asset, AssetSubscribe
 from quant.utils.decorator import async_method_locker
-from quant.utils.web import Websocket, AsyncHttpRequests
+from quant.utils.web import Websocket, AsyncHttpRequests, build_url
 from quant.order import ORDER_ACTION_BUY, ORDER_ACTION_SELL
 from quant.order import ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET
 from quant.order import ORDER_STATUS_SUBMITTED, ORDER_STATUS_PARTIAL_FILLED, ORDER_STATUS_FILLED, \
@@ -43,14 +46,43 @@ class OKExRestAPI:
         access_key: Account's ACCESS KEY.
         secret_key: Account's SECRET KEY.
         passphrase: API KEY Passphrase.
+        pool_size: Maximum number of simultaneous connections to host, default is 32. Deployments which trade many
+            symbols concurrently should raise this value.
+        dns_cache_ttl: DNS resolution cache time(seconds), default is 300s.
     """
 
-    def __init__(self, host, access_key, secret_key, passphrase):
+    def __init__(self, host, access_key, secret_key, passphrase, pool_size=32, dns_cache_ttl=300):
         """initialize."""
         self._host = host
         self._access_key = access_key
         self._secret_key = secret_key
         self._passphrase = passphrase
+        self._auth_headers = {  # Static headers for authenticated requests.
+            "Content-Type": "application/json",
+            "OK-ACCESS-KEY": access_key,
+            "OK-ACCESS-PASSPHRASE": passphrase
+        }
+        self._hmac = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)  # Keyed HMAC, copied for each signature.
+        self._pool_size = pool_size
+        self._dns_cache_ttl = dns_cache_ttl
+        self._session = None  # HTTP session, all requests of this client share its connection pool.
+        AsyncHttpRequests.register_client(self)
+
+    @property
+    def session(self):
+        """HTTP session, created on first use so that it is bound to the running event loop."""
+        if not self._session or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._pool_size, limit_per_host=self._pool_size,
+                                             ttl_dns_cache=self._dns_cache_ttl, keepalive_timeout=30,
+                                             enable_cleanup_closed=True)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """Close HTTP session and release all connections."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def get_user_account(self):
         """ Get account asset information.
@@ -120,27 +152,43 @@ class OKExRestAPI:
         return order_no, result
 
     async def revoke_orders(self, symbol, order_nos):
-        """ Cancelling multiple open orders with order_id，Maximum 10 orders can be cancelled at a time for each
-            trading pair.
+        """ Cancelling multiple open orders with order_id. Maximum 10 orders can be cancelled at a time for each
+            trading pair, so order_nos will be split into batches of 10 and all batches are requested concurrently.
 
         Args:
             symbol: Trading pair, e.g. BTCUSDT.
             order_nos: order IDs.
 
         Returns:
-            success: Success results, otherwise it's None.
-            error: Error information, otherwise it's None.
+            success: Merged results of all successful batches, e.g.
+                {"btc-usdt": [{"order_id": "123", "result": true, ...}, ...]}
+            error: Error information of the first failed batch, otherwise it's None.
+
+        NOTE:
+            If some batches failed, results of the other batches are still returned in `success`, so that the caller
+            can know which orders have been cancelled.
         """
-        if len(order_nos) > 10:
-            logger.warn("only revoke 10 orders per request!", caller=self)
-        body = [
-            {
-                "instrument_id": symbol,
-                "order_ids": order_nos[:10]
-            }
-        ]
-        result, error = await self.request("POST", "/api/spot/v3/cancel_batch_orders", body=body, auth=True)
-        return result, error
+        success = {}
+        if not order_nos:
+            return success, None
+        tasks = []
+        for i in range(0, len(order_nos), 10):
+            body = [
+                {
+                    "instrument_id": symbol,
+                    "order_ids": order_nos[i:i + 10]
+                }
+            ]
+            tasks.append(self.request("POST", "/api/spot/v3/cancel_batch_orders", body=body, auth=True))
+        results = await asyncio.gather(*tasks)
+        error = None
+        for result, e in results:
+            if e:
+                error = error or e
+                continue
+            for key, items in result.items():
+                success.setdefault(key, []).extend(items)
+        return success, error
 
     async def get_open_orders(self, symbol, limit=100):
         """ Get order details by order ID.
@@ -158,7 +206,7 @@ class OKExRestAPI:
             "instrument_id": symbol,
             "limit": limit
         }
-        result, error = await self.request("GET", uri, params=params, auth=True)
+        result, error = await self.request("GET", uri, params=params, auth=True, presorted=True)
         return result, error
 
     async def get_order_status(self, symbol, order_no):
@@ -175,10 +223,10 @@ class OKExRestAPI:
             "instrument_id": symbol
         }
         uri = "/api/spot/v3/orders/{order_no}".format(order_no=order_no)
-        result, error = await self.request("GET", uri, params=params, auth=True)
+        result, error = await self.request("GET", uri, params=params, auth=True, presorted=True)
         return result, error
 
-    async def request(self, method, uri, params=None, body=None, headers=None, auth=False):
+    async def request(self, method, uri, params=None, body=None, headers=None, auth=False, presorted=False):
         """ Do HTTP request.
 
         Args:
@@ -188,36 +236,34 @@ class OKExRestAPI:
             body:   HTTP request body.
             headers: HTTP request headers.
             auth: If this request requires authentication.
+            presorted: If params is already sorted by key, the query string will not be sorted again.
 
         Returns:
             success: Success results, otherwise it's None.
             error: Error information, otherwise it's None.
         """
+        url = build_url(self._host, uri)
         if params:
-            query = "&".join(["{}={}".format(k, params[k]) for k in sorted(params.keys())])
+            keys = params.keys() if presorted else sorted(params.keys())
+            query = "&".join(["{}={}".format(k, params[k]) for k in keys])
             uri += "?" + query
-        url = urljoin(self._host, uri)
+            url += "?" + query
 
         if auth:
-            timestamp = str(time.time()).split(".")[0] + "." + str(time.time()).split(".")[1][:3]
-            if body:
-                body = json.dumps(body)
-            else:
-                body = ""
-            message = str(timestamp) + str.upper(method) + uri + str(body)
-            mac = hmac.new(bytes(self._secret_key, encoding="utf8"), bytes(message, encoding="utf-8"),
-                           digestmod="sha256")
+            ts = tools.get_cur_timestamp_ms()
+            timestamp = "{}.{:03d}".format(ts // 1000, ts % 1000)
+            body = orjson.dumps(body) if body else b""
+            mac = self._hmac.copy()
+            mac.update((timestamp + str.upper(method) + uri).encode())
+            mac.update(body)
             d = mac.digest()
             sign = base64.b64encode(d)
 
-            if not headers:
-                headers = {}
-            headers["Content-Type"] = "application/json"
-            headers["OK-ACCESS-KEY"] = self._access_key.encode().decode()
+            headers = {**headers, **self._auth_headers} if headers else self._auth_headers.copy()
             headers["OK-ACCESS-SIGN"] = sign.decode()
-            headers["OK-ACCESS-TIMESTAMP"] = str(timestamp)
-            headers["OK-ACCESS-PASSPHRASE"] = self._passphrase
-        _, success, error = await AsyncHttpRequests.fetch(method, url, body=body, headers=headers, timeout=10)
+            headers["OK-ACCESS-TIMESTAMP"] = timestamp
+        _, success, error = await AsyncHttpRequests.fetch(method, url, body=body, headers=headers, timeout=10,
+                                                          session=self.session)
         return success, error
 
 
@@ -233,6 +279,9 @@ class OKExTrade:
         access_key: Account's ACCESS KEY.
         secret_key Account's SECRET KEY.
         passphrase API KEY Passphrase.
+        pool_size: Maximum number of simultaneous REST API connections, raise it if you trade many symbols
+            concurrently. (default 32)
+        dns_cache_ttl: REST API DNS resolution cache time(seconds). (default 300)
         asset_update_callback: You can use this param to specific a async callback function when you initializing Trade
             object. `asset_update_callback` is like `async def on_asset_update_callback(asset: Asset): pass` and this
             callback function will be executed asynchronous when received AssetEvent.
@@ -292,7 +341,9 @@ class OKExTrade:
         self._orders = {}  # Order objects. e.g. {"order_no": Order, ... }
 
         # Initializing our REST API client.
-        self._rest_api = OKExRestAPI(self._host, self._access_key, self._secret_key, self._passphrase)
+        self._rest_api = OKExRestAPI(self._host, self._access_key, self._secret_key, self._passphrase,
+                                     pool_size=kwargs.get("pool_size", 32),
+                                     dns_cache_ttl=kwargs.get("dns_cache_ttl", 300))
 
         # Subscribing AssetEvent.
         if self._asset_update_callback:
@@ -312,16 +363,20 @@ class OKExTrade:
     def rest_api(self):
         return self._rest_api
 
+    async def close(self):
+        """Close REST API client's HTTP connections."""
+        await self._rest_api.close()
+
     async def _send_heartbeat_msg(self, *args, **kwargs):
         msg = "ping"
         await self._ws.send(msg)
 
     async def connected_callback(self):
         """After websocket connection created successfully, we will send a message to server for authentication."""
-        timestamp = str(time.time()).split(".")[0] + "." + str(time.time()).split(".")[1][:3]
-        message = str(timestamp) + "GET" + "/users/self/verify"
-        mac = hmac.new(bytes(self._secret_key, encoding="utf8"), bytes(message, encoding="utf8"), digestmod="sha256")
-        d = mac.digest()
+        ts = tools.get_cur_timestamp_ms()
+        timestamp = "{}.{:03d}".format(ts // 1000, ts % 1000)
+        message = timestamp + "GET" + "/users/self/verify"
+        d = hmac.digest(self._secret_key.encode(), message.encode(), "sha256")
         signature = base64.b64encode(d).decode()
         data = {
             "op": "login",
@@ -44,6 +44,7 @@ class Quant:
 
         logger.info("start io loop ...", caller=self)
         self.loop.run_forever()
+        self._close_http_sessions()
 
     def stop(self):
         """Stop the event loop."""
@@ -51,8 +52,13 @@ class Quant:
         self.loop.stop()
 
     def _get_event_loop(self):
-        """ Get a main io loop. """
+        """ Get a main io loop. If `uvloop` is installed, use it as the event loop for better I/O performance. """
         if not self.loop:
+            try:
+                import uvloop
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            except ImportError:
+                pass
             self.loop = asyncio.get_event_loop()
         return self.loop
 
@@ -84,6 +90,11 @@ class Quant:
             self.event_center = EventCenter()
             self.loop.run_until_complete(self.event_center.connect())
 
+    def _close_http_sessions(self):
+        """Close all HTTP sessions after the event loop stopped."""
+        from quant.utils.web import AsyncHttpRequests
+        self.loop.run_until_complete(AsyncHttpRequests.close_all())
+
     def _do_heartbeat(self):
         """Start server heartbeat."""
         from quant.heartbeat import heartbeat
@@ -100,6 +100,10 @@ class Trade:
     def rest_api(self):
         return self._t.rest_api
 
+    async def close(self):
+        """Close Trade module's HTTP connections."""
+        await self._t.close()
+
     async def create_order(self, action, price, quantity, order_type=ORDER_TYPE_LIMIT, *args, **kwargs):
         """ Create an order.
 
@@ -8,6 +8,7 @@ Date:   2018/08/03
 Email:  Huangtao@ifclover.com
 """
 
+import time
 import asyncio
 import functools
 
@@ -15,6 +16,9 @@ import functools
 # Coroutine lockers. e.g. {"locker_name": locker}
 METHOD_LOCKERS = {}
 
+# In-flight HTTP GET requests. e.g. {(id(client), uri, params, kwargs): task}
+IN_FLIGHT_REQUESTS = {}
+
 
 def async_method_locker(name, wait=True):
     """ In order to share memory between any asynchronous coroutine methods, we should use locker to lock our method,
@@ -50,6 +54,72 @@ def async_method_locker(name, wait=True):
     return decorating_function
 
 
+def async_request_coalescer(func):
+    """ Coalesce concurrent identical public HTTP GET requests of a REST API client, so that every caller of the same
+        in-flight request shares one network round-trip. The result is NOT cached after the request finished.
+
+    NOTE:
+        This decorator must to be used on REST API client's `async def request(self, method, uri, params=None, ...)`.
+        Requests with `auth=True`, body, headers or any positional arguments beyond params will not be coalesced,
+        signed requests query private state (orders, balances) and must always see the result of the latest write.
+        The shared result object is returned to every caller, so it MUST be treated as read-only.
+    """
+    @functools.wraps(func)
+    async def wrapper(self, method, uri, params=None, *args, **kwargs):
+        if method != "GET" or args or kwargs.get("auth") or kwargs.get("body") or kwargs.get("headers"):
+            return await func(self, method, uri, params, *args, **kwargs)
+        try:
+            key = (id(self), uri, tuple(sorted(params.items())) if params else None, tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:
+            return await func(self, method, uri, params, **kwargs)
+
+        task = IN_FLIGHT_REQUESTS.get(key)
+        if not task:
+            task = asyncio.ensure_future(func(self, method, uri, params, **kwargs))
+            IN_FLIGHT_REQUESTS[key] = task
+
+            def done_callback(t):
+                if IN_FLIGHT_REQUESTS.get(key) is t:
+                    IN_FLIGHT_REQUESTS.pop(key)
+            task.add_done_callback(done_callback)
+        return await asyncio.shield(task)
+    return wrapper
+
+
+def async_ttl_cache(ttl, error_ttl=0):
+    """ Cache the `(success, error)` results of an asynchronous method for each object, so that repeated calls within
+        `ttl` seconds will not do network round-trip again. It's useful for low-churn data, e.g. exchange information.
+
+    Args:
+        ttl: Time(seconds) to keep a success result.
+        error_ttl: Time(seconds) to keep an error result, default is 0 (do not cache error).
+
+    NOTE:
+        This decorator must to be used on `async method` which returns `(success, error)`.
+        The same cached result object is returned to every caller until it expires, so it MUST be treated as
+        read-only, copy it before modifying.
+    """
+    def decorating_function(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            cache = self.__dict__.setdefault("_ttl_cache", {})  # {key: (expire_time, result), ... }
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            item = cache.get(key)
+            if item and item[0] > now:
+                return item[1]
+            result = await method(self, *args, **kwargs)
+            expire = ttl if not result[1] else error_ttl
+            if expire > 0:
+                cache[key] = (time.monotonic() + expire, result)
+            else:
+                cache.pop(key, None)
+            return result
+        return wrapper
+    return decorating_function
+
+
 # class Test:
 #
 #     @async_method_locker('my_fucker', False)
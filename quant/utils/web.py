@@ -8,18 +8,34 @@ Email:  huangtao@ifclover.com
 """
 
 import json
+import weakref
+import functools
 
 import aiohttp
-from urllib.parse import urlparse
+import orjson
+from urllib.parse import urlparse, urljoin
 
 from quant.utils import logger
 from quant.config import config
 from quant.tasks import LoopRunTask, SingleTask
 
 
-__all__ = ("Websocket", "AsyncHttpRequests", )
+__all__ = ("Websocket", "AsyncHttpRequests", "build_url", )
 
 
+@functools.lru_cache(maxsize=256)
+def build_url(host, uri):
+    """ Join request host and uri to a full url. REST API endpoints are almost fixed, so the result will be cached.
+
+    Args:
+        host: HTTP request host, e.g. `https://api.binance.com`.
+        uri: HTTP request uri, e.g. `/api/v3/order`.
+
+    Returns:
+        url: Full request url.
+    """
+    return urljoin(host, uri)
+
 
 class Websocket:
     """ Websocket connection.
@@ -130,6 +146,8 @@ class AsyncHttpRequests(object):
 
     # Every domain name holds a connection session, for less system resource utilization and faster request speed.
     _SESSIONS = {}  # {"domain-name": session, ... }
+    # REST API clients which hold their own sessions, they will be closed by `close_all`.
+    _CLIENTS = weakref.WeakSet()
 
     @classmethod
     async def fetch(cls, method, url, params=None, body=None, data=None, headers=None, timeout=30, **kwargs):
@@ -142,10 +160,11 @@ class AsyncHttpRequests(object):
             body: HTTP request body, string or bytes format.
             data: HTTP request body, dict format.
             headers: HTTP request header.
-            timeout: HTTP request timeout(seconds), default is 30s.
+            timeout: HTTP request timeout(seconds) or `aiohttp.ClientTimeout` object, default is 30s.
 
             kwargs:
                 proxy: HTTP proxy.
+                session: HTTP request session, if not specified, use the session shared by url's domain.
 
         Return:
             code: HTTP response code.
@@ -156,7 +175,9 @@ class AsyncHttpRequests(object):
             HTTP request exceptions or response data parse exceptions. All the exceptions will be captured and return
             Error information.
         """
-        session = cls._get_session(url)
+        session = kwargs.pop("session", None) or cls._get_session(url)
+        if not isinstance(timeout, aiohttp.ClientTimeout):
+            timeout = aiohttp.ClientTimeout(total=timeout)
         if not kwargs.get("proxy"):
             kwargs["proxy"] = config.proxy  # If there is a HTTP PROXY assigned in config file?
         try:
@@ -185,13 +206,13 @@ class AsyncHttpRequests(object):
                          "data:", data, "code:", code, "result:", text, caller=cls)
             return code, None, text
         try:
-            result = await response.json()
+            result = orjson.loads(await response.read())
         except:
             result = await response.text()
             logger.warn("response data is not json format!", "method:", method, "url:", url, "headers:", headers,
                         "params:", params, "body:", body, "data:", data, "code:", code, "result:", result, caller=cls)
         logger.debug("method:", method, "url:", url, "headers:", headers, "params:", params, "body:", body,
-                     "data:", data, "code:", code, "result:", json.dumps(result), caller=cls)
+                     "data:", data, "code:", code, "result:", orjson.dumps(result).decode(), caller=cls)
         return code, result, None
 
     @classmethod
@@ -238,3 +259,21 @@ class AsyncHttpRequests(object):
             session = aiohttp.ClientSession()
             cls._SESSIONS[key] = session
         return cls._SESSIONS[key]
+
+    @classmethod
+    def register_client(cls, client):
+        """ Register a REST API client which holds its own session, the client must have a `async def close()`.
+
+        Args:
+            client: REST API client object.
+        """
+        cls._CLIENTS.add(client)
+
+    @classmethod
+    async def close_all(cls):
+        """Close all the sessions shared by domain and all the registered REST API clients' sessions."""
+        for client in list(cls._CLIENTS):
+            await client.close()
+        for session in cls._SESSIONS.values():
+            await session.close()
+        cls._SESSIONS.clear()